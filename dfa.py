@@ -21,8 +21,6 @@ TransitionsRow\t - a class for a transition table row, mapping input IOSymbols t
 DFA\t - a class for the DFA itself
 """
 
-from itertools import combinations
-
 class IOSymbol:
     """a class of symbol equipped with types, to permit clarity with symbols like <EOF>"""
     kinds = ['char', 'eof']
@@ -35,7 +33,11 @@ class IOSymbol:
     def __eq__(self, other):
         return isinstance(other, IOSymbol) and self.kind == other.kind and self.value == other.value
     def __hash__(self):
-        return hash(self.kind + str(self.value))
+        try:
+            return hash((self.kind, self.value))
+        except TypeError:
+            # the value may be unhashable, e.g. a list; equal values still give equal strings
+            return hash((self.kind, str(self.value)))
     def __str__(self):
         if self.kind == 'char':
             return self.value
@@ -48,6 +50,7 @@ class IOSymbol:
 
 class State:
     """a class for DFA states, storing a name and the transitions that leave this state"""
+    __slots__ = ('name', 'transitions')
     def __init__(self, name, transitions = None):
         """takes a name and an optional transitions argumant that may be an unconditional Transition, a TransitionRow, or a string or dict that will be used to construct one of those two repsectively"""
         self.name = name
@@ -55,7 +58,7 @@ class State:
             self.transitions = Transition(transitions)
         elif isinstance(transitions, dict):
             self.transitions = TransitionsRow(transitions)
-        elif isinstance(transitions, Transition) or isinstance(transitions, TransitionsRow):
+        elif isinstance(transitions, Transition) or isinstance(transitions, TransitionsRow) or transitions is None:
             self.transitions = transitions
     def __eq__(self, other):
         if isinstance(other, State) and self.name == other.name:
@@ -73,6 +76,7 @@ class State:
 
 class Transition:
     """a small class for a transition, storing a destination state name and an optional output list of IOSymbols"""
+    __slots__ = ('state_to', 'output')
     def __init__(self, state_to, output = []):
         """takes a destination state name and an optional output list of IOSymbols"""
         self.state_to = state_to
@@ -88,8 +92,9 @@ class DFA:
     """a class for a finite automaton
 
     provides decide and minimise functions as well as the ability to run the automaton directly."""
-    def __init__(self, start, states, minimise = True):
-        """takes a starting state name and a list of States. minimises automatically by default, this can be disabled with the minimise argument"""
+    def __init__(self, start, states, minimise = True, verbose = False):
+        """takes a starting state name and a list of States. minimises automatically by default, this can be disabled with the minimise argument. progress reporting is enabled with the verbose argument"""
+        self.verbose = verbose
         self.states = {}
         for state in states:
             if state.name in self.states:
@@ -98,34 +103,91 @@ class DFA:
                 self.states[state.name] = state
         self.start = start
         if start not in self.states:
-            print(self.states)
+            if self.verbose:
+                print(self.states)
             raise Exception(f"DFA given nonexistant start state '{start}'")
         
         self.epsilons_minimised = False
         if minimise:
             self.minimise()
     def minimise_epsilons(self):
-        """remove all epsilon transitions except those that point back at the state they come from"""
-        while True:
-            removed = False
-            for state in self.states.values():
-                if isinstance(state.transitions, Transition):
-                    for other_state in self.states.values():
-                        if isinstance(other_state.transitions, Transition):
-                            if other_state.transitions.state_to == state.name:
-                                other_state.transitions.state_to = state.transitions.state_to
-                                other_state.transitions.output += state.transitions.output
-                        elif isinstance(other_state.transitions, TransitionsRow):
-                            for symbol in other_state.transitions.inputs:
-                                if other_state.transitions.inputs[symbol].state_to == state.name:
-                                    other_state.transitions.inputs[symbol].state_to = state.transitions.state_to
-                                    other_state.transitions.inputs[symbol].output += state.transitions.output
-                    removed = state.name
+        """remove all epsilon transitions except those that point back at the state they come from, and possibly one leaving the start state
+
+        each chain of epsilons is followed once and every state on it is mapped straight to where the chain ends. a cycle of
+        epsilons is folded into a single state that loops back to itself. the start state is never removed, so if it begins an
+        epsilon chain it keeps an epsilon transition straight to the end of that chain"""
+        ends = {} # state name -> name of the state its epsilon chain ends at
+        suffixes = {} # state name -> output from there to the end of its chain, as shared (output, rest) links
+        def suffix(name):
+            # walks forward only as far as the first state already known, then fills in the links on the way back. links
+            # with no output are skipped, so reading a suffix only costs the output it produces
+            path = []
+            while name not in suffixes:
+                if ends[name] == name:
+                    suffixes[name] = None
+                    break
+                path.append(name)
+                name = self.states[name].transitions.state_to
+            for link in reversed(path):
+                transitions = self.states[link].transitions
+                rest = suffixes[transitions.state_to]
+                suffixes[link] = (transitions.output, rest) if transitions.output else rest
+            return suffixes[path[0]] if path else suffixes[name]
+        def chain_output(name):
+            # the output produced following epsilons from state <name> to the end of its chain
+            output = []
+            link = suffix(name)
+            while link is not None:
+                output += link[0]
+                link = link[1]
+            return output
+        def collapse(name):
+            chain = []
+            on_chain = set()
+            cycle_head = None
+            while name not in ends:
+                transitions = self.states[name].transitions
+                if not isinstance(transitions, Transition) or transitions.state_to == name:
+                    ends[name] = name
+                    break
+                if name in on_chain:
+                    ends[name] = name
+                    cycle_head = name
                     break
-            if removed:
-                self.states.pop(removed)
+                chain.append(name)
+                on_chain.add(name)
+                name = transitions.state_to
+            for link in chain:
+                ends.setdefault(link, ends[name])
+            if cycle_head is not None:
+                # epsilon cycle: keep its head, looping back to itself with the output of the whole cycle
+                transitions = self.states[cycle_head].transitions
+                self.states[cycle_head].transitions = Transition(cycle_head, transitions.output + chain_output(transitions.state_to))
+        for name in self.states:
+            if name not in ends:
+                collapse(name)
+        # redirect every surviving transition past the removed states. the new targets and outputs are all worked out before any
+        # are changed, since suffix follows the original links
+        redirects = []
+        for state in self.states.values():
+            if ends[state.name] != state.name and state.name != self.start:
+                continue
+            if isinstance(state.transitions, Transition):
+                transitions = [state.transitions]
+            elif isinstance(state.transitions, TransitionsRow):
+                transitions = state.transitions.inputs.values()
             else:
-                break
+                continue
+            for transition in transitions:
+                end = ends[transition.state_to]
+                if end != transition.state_to:
+                    redirects.append((transition, end, chain_output(transition.state_to)))
+        for transition, end, output in redirects:
+            transition.state_to = end
+            transition.output = transition.output + output
+        for name, end in ends.items():
+            if end != name and name != self.start:
+                self.states.pop(name)
         self.epsilons_minimised = True
     def run(self, start = None, input_buffer = []):
         """run the automaton, starting from the default start state unless otherwise specified, on the given input list of IOSymbols"""
@@ -157,43 +219,54 @@ class DFA:
                 input_buffer = input_buffer[1:]
             else:
                 input_symbol = IOSymbol('eof')
-            if input_symbol in state.transitions.inputs:
-                next_state_name = state.transitions.inputs[input_symbol].state_to
-                output = state.transitions.inputs[input_symbol].output
+            transition = state.transitions.inputs.get(input_symbol)
+            if transition is not None:
+                next_state_name = transition.state_to
+                output = transition.output
             else:
                 next_state_name = None
                 output = []
         
         if next_state_name is None:
-            next_state = None
-        elif next_state_name not in self.states:
-            raise Exception(f"transition to nonexistant state '{new_state_name}' from '{state}'")
-        else:
-            next_state = self.states[next_state_name]
+            return (None, output, input_buffer)
+        next_state = self.states.get(next_state_name)
+        if next_state is None:
+            raise Exception(f"transition to nonexistant state '{next_state_name}' from '{state}'")
         return (next_state, output, input_buffer)
     def decide(self, start, possible_inputs):
-        """decide whether the DFA will or may halt, starting from state <start> with allowed input alphabet <possible_inputs>"""
-        def decide_recursive(start, visited = []) :
-            if start in visited:
-                return (False, True)
-            elif self.states[start].transitions is None:
-                return (True, False)
-            elif isinstance(self.states[start].transitions, Transition):
-                return decide_recursive(self.states[start].transitions.state_to, visited + [start])
-            elif isinstance(self.states[start].transitions, TransitionsRow):
-                options = []
-                possible_input_values = 0
-                for input_value in self.states[start].transitions.inputs:
-                    if input_value in possible_inputs:
-                        options.append(decide_recursive(self.states[start].transitions.inputs[input_value].state_to, visited + [start]))
-                        possible_input_values += 1
-                if possible_input_values < len(possible_inputs):
-                    options.append((True,False))
-                result = (False, False)
-                for i in range(len(options)):
-                    result = (options[i][0] or result[0], options[i][1] or result[1])
-                return result
-        halt_possible, loop_possible = decide_recursive(start)
+        """decide whether the DFA will or may halt, starting from state <start> with allowed input alphabet <possible_inputs>
+
+        walks the reachable states depth first with an explicit stack, visiting each once: halting is possible if any reachable
+        state can halt, and running forever is possible if any path leads back onto itself"""
+        def successors(name):
+            transitions = self.states[name].transitions
+            if transitions is None:
+                return (True, [])
+            elif isinstance(transitions, Transition):
+                return (False, [transitions.state_to])
+            elif isinstance(transitions, TransitionsRow):
+                targets = [transitions.inputs[input_value].state_to for input_value in transitions.inputs if input_value in possible_inputs]
+                return (len(targets) < len(possible_inputs), targets)
+        halt_possible, targets = successors(start)
+        loop_possible = False
+        on_path = {start}
+        finished = set()
+        stack = [(start, iter(targets))]
+        while stack:
+            name, targets = stack[-1]
+            for target in targets:
+                if target in on_path:
+                    loop_possible = True
+                elif target not in finished:
+                    halts, next_targets = successors(target)
+                    halt_possible = halt_possible or halts
+                    on_path.add(target)
+                    stack.append((target, iter(next_targets)))
+                    break
+            else:
+                stack.pop()
+                on_path.remove(name)
+                finished.add(name)
         if halt_possible and loop_possible:
             return 'may run forever or halt depending on input'
         elif (not halt_possible) and loop_possible:
@@ -208,72 +281,60 @@ class DFA:
         ensures that if the default start state is indistinguishable from some others, the resulting aggregate state has the name of the start state rather than any of the others"""
         if not self.epsilons_minimised:
             self.minimise_epsilons()
-        distinctness_table = {pair: None for pair in combinations(self.states.keys(), 2)}
-        def distinguish(state_a, state_b, visited):
-            state_a = self.states[state_a]
-            state_b = self.states[state_b]
-            #print(f"{state_a} {state_b} {visited}")
-            if state_a == state_b:
-                #print(f"0 {state_a} {state_b} False")
-                return False # no need to record distinctness of a state from itself
-            if state_a.name in visited:
-                #print(f"1 {state_a} {state_b} {state_b not in visited[state_a]}")
-                return record_distinctness(state_a, state_b, state_b.name not in visited[state_a.name])
-            if state_a.transitions is None:
-                #print(f"2 {state_a} {state_b} {state_b.transitions is not None}")
-                return record_distinctness(state_a, state_b, state_b.transitions is not None)
-            if isinstance(state_a.transitions, Transition) and isinstance(state_b.transitions, Transition):
-                if state_a.transitions.output == state_b.transitions.output:
-                    assert((state_a.transitions.state_to == state_a.name) and (state_b.transitions.state_to == state_b.name)) # should never happen, means we didn't succeed in eliminating non-self-targeting epsilons
-                    #print(f"3 {state_a} {state_b} False")
-                    return record_distinctness(state_a, state_b, False)
-            if isinstance(state_a.transitions, TransitionsRow) and isinstance(state_b.transitions, TransitionsRow):
-                if set(state_a.transitions.inputs.keys()) != set(state_b.transitions.inputs.keys()):
-                    #print(f"4 {state_a} {state_b} True")
-                    return record_distinctness(state_a, state_b, True)
-                if state_a.name in visited:
-                    visited[state_a.name].add(state_b.name)
-                else:
-                    visited[state_a.name] = set([state_b.name])
-                transitions_a = state_a.transitions.inputs
-                transitions_b = state_b.transitions.inputs
-                r = any([transitions_a[symbol].output == transitions_b[symbol].output
-                         and distinguish(transitions_a[symbol].state_to, transitions_b[symbol].state_to, dict(visited))
-                         for symbol in state_a.transitions.inputs])
-                #print(f"5 {state_a} {state_b} {r}")
-                return record_distinctness(state_a, state_b, r)
-            #print(f"6 {state_a} {state_b} True")
-            return record_distinctness(state_a, state_b, True)
-        def record_distinctness(state_a, state_b, v):
-            if (state_a.name, state_b.name) in distinctness_table:
-                distinctness_table[(state_a.name, state_b.name)] = v
-                return v
-            elif (state_b.name, state_a.name) in distinctness_table:
-                distinctness_table[(state_b.name, state_a.name)] = v
-                return v
+        # hopcroft's partition refinement. states start out grouped by everything that can be seen without following a
+        # transition: whether they halt, which inputs they accept and what each transition outputs. classes are then split
+        # until every member of a class moves into the same class on each input
+        def edges(state):
+            if isinstance(state.transitions, Transition):
+                return [(None, state.transitions)]
+            elif isinstance(state.transitions, TransitionsRow):
+                return list(state.transitions.inputs.items())
             else:
-                raise Exception(f"state pair not found in distinctness table: {state_a}:{type(state_a)}, {state_b}:{type(state_b)}")
-        n = 0
-        for pair in distinctness_table:
-            if distinctness_table[pair] is None:
-                n += 1
-                distinguish(pair[0], pair[1], {})
-        print(f"{n}/{len(distinctness_table)}")
-        #print(distinctness_table)
-        # use table to sort into equivalence classes each with a representative member
-        equivalence_classes = {list(self.states.keys())[n]: n for n in range(len(self.states))}
-        for pair in distinctness_table:
-            if not distinctness_table[pair]:
-                equivalence_classes[pair[0]] = equivalence_classes[pair[1]]
+                return []
+        shapes = {}
+        inverse = {} # input symbol (None for epsilons) -> target state name -> set of names of states that go there on it
+        for state in self.states.values():
+            shape = (type(state.transitions), frozenset((symbol, tuple(transition.output)) for symbol, transition in edges(state)))
+            shapes.setdefault(shape, set()).add(state.name)
+            for symbol, transition in edges(state):
+                inverse.setdefault(symbol, {}).setdefault(transition.state_to, set()).add(state.name)
+        partition = list(shapes.values())
+        equivalence_classes = {state: n for n in range(len(partition)) for state in partition[n]}
+        # every class starts out as a splitter; since a class either all has or all lacks a transition on each input that keeps
+        # the smaller-half rule valid even though the automaton isn't complete
+        waiting = set(range(len(partition)))
+        while waiting:
+            splitter = list(partition[waiting.pop()])
+            for sources in inverse.values():
+                predecessors = {}
+                for target in splitter:
+                    for state in sources.get(target, ()):
+                        predecessors.setdefault(equivalence_classes[state], set()).add(state)
+                for n, inside in predecessors.items():
+                    if len(inside) == len(partition[n]):
+                        continue
+                    # split in place so only the moving states are touched. if class n was waiting both halves must be,
+                    # otherwise only the smaller half needs to be
+                    partition[n] -= inside
+                    partition.append(inside)
+                    for state in inside:
+                        equivalence_classes[state] = len(partition) - 1
+                    if n in waiting or len(inside) <= len(partition[n]):
+                        waiting.add(len(partition) - 1)
+                    else:
+                        waiting.add(n)
+        if self.verbose:
+            print(f"{len(partition)}/{len(self.states)}")
         representative_states = {}
         for state in self.states:
             # make sure self.start is the representative of its class
             if (equivalence_classes[state] not in representative_states) or representative_states[equivalence_classes[state]] != self.start:
                 representative_states[equivalence_classes[state]] = state
         # actually do the minimisation
+        representatives = set(representative_states.values())
         to_remove = []
         for state in self.states.values():
-            if state.name not in representative_states.values():
+            if state.name not in representatives:
                 to_remove.append(state.name)
             else:
                 if isinstance(state.transitions, Transition):
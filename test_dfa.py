@@ -0,0 +1,168 @@
+import unittest
+
+from dfa import DFA, IOSymbol, State, Transition
+
+def char(c):
+    return IOSymbol('char', c)
+
+class CountingState(State):
+    """a State that counts how many times its transitions are read"""
+    __slots__ = ()
+    reads = 0
+    @property
+    def transitions(self):
+        CountingState.reads += 1
+        return State.transitions.__get__(self)
+    @transitions.setter
+    def transitions(self, value):
+        State.transitions.__set__(self, value)
+
+def targets(state):
+    """the destination and output of each input of a state's TransitionsRow, as {input value: (state name, output values)}"""
+    return {symbol.value: (transition.state_to, [out.value for out in transition.output]) for symbol, transition in state.transitions.inputs.items()}
+
+class TestIOSymbol(unittest.TestCase):
+    def test_unhashable_value(self):
+        self.assertEqual(hash(IOSymbol('char', [1, 2])), hash(IOSymbol('char', [1, 2])))
+        self.assertEqual({IOSymbol('char', [1, 2]): 'x'}[IOSymbol('char', [1, 2])], 'x')
+
+class TestDFA(unittest.TestCase):
+    def test_rejects_duplicate_state_names(self):
+        state = State('A', {char('a'): Transition('A')})
+        with self.assertRaises(Exception):
+            DFA('A', [state, State('A', {char('b'): Transition('A')})])
+        with self.assertRaises(Exception):
+            DFA('A', [state, state])
+
+class TestMinimiseEpsilons(unittest.TestCase):
+    def minimise_epsilons(self, start, states):
+        dfa = DFA(start, states, minimise = False)
+        dfa.minimise_epsilons()
+        return dfa
+
+    def test_chain(self):
+        dfa = self.minimise_epsilons('A', [State('A', {char('a'): Transition('E1', [char('o')])}),
+                                           State('E1', Transition('E2', [char('x')])),
+                                           State('E2', Transition('B', [char('y')])),
+                                           State('B', {char('a'): Transition('A')})])
+        self.assertEqual(set(dfa.states), {'A', 'B'})
+        self.assertEqual(targets(dfa.states['A']), {'a': ('B', ['o', 'x', 'y'])})
+
+    def test_chain_into_halting_state(self):
+        dfa = self.minimise_epsilons('A', [State('A', {char('a'): Transition('E', [char('o')])}),
+                                           State('E', Transition('H', [char('x')])),
+                                           State('H')])
+        self.assertEqual(set(dfa.states), {'A', 'H'})
+        self.assertEqual(targets(dfa.states['A']), {'a': ('H', ['o', 'x'])})
+        self.assertIsNone(dfa.states['H'].transitions)
+
+    def test_cycle(self):
+        # C1 -> C2 -> C1 is a cycle with head C1, entered at the head, part way round, and through the tail T
+        dfa = self.minimise_epsilons('A', [State('A', {char('a'): Transition('C1'), char('b'): Transition('T'), char('c'): Transition('C2')}),
+                                           State('T', Transition('C1', [char('t')])),
+                                           State('C1', Transition('C2', [char('p')])),
+                                           State('C2', Transition('C1', [char('q')]))])
+        self.assertEqual(set(dfa.states), {'A', 'C1'})
+        self.assertEqual(targets(dfa.states['A']), {'a': ('C1', []), 'b': ('C1', ['t']), 'c': ('C1', ['q'])})
+        self.assertEqual(dfa.states['C1'].transitions.state_to, 'C1')
+        self.assertEqual([out.value for out in dfa.states['C1'].transitions.output], ['p', 'q'])
+
+    def test_start_state_begins_chain(self):
+        dfa = self.minimise_epsilons('S', [State('S', Transition('E', [char('x')])),
+                                           State('E', Transition('B', [char('y')])),
+                                           State('B', {char('a'): Transition('E')})])
+        self.assertEqual(set(dfa.states), {'S', 'B'})
+        self.assertEqual(dfa.states['S'].transitions.state_to, 'B')
+        self.assertEqual([out.value for out in dfa.states['S'].transitions.output], ['x', 'y'])
+        self.assertEqual(targets(dfa.states['B']), {'a': ('B', ['y'])})
+
+    def test_start_state_inside_cycle(self):
+        # C is the head of the cycle C -> S -> C, so S survives only because it is the start state
+        dfa = self.minimise_epsilons('S', [State('X', {char('a'): Transition('S')}),
+                                           State('C', Transition('S', [char('c')])),
+                                           State('S', Transition('C', [char('s')]))])
+        self.assertEqual(set(dfa.states), {'X', 'C', 'S'})
+        self.assertEqual(dfa.states['C'].transitions.state_to, 'C')
+        self.assertEqual([out.value for out in dfa.states['C'].transitions.output], ['c', 's'])
+        self.assertEqual(dfa.states['S'].transitions.state_to, 'C')
+        self.assertEqual([out.value for out in dfa.states['S'].transitions.output], ['s'])
+        self.assertEqual(targets(dfa.states['X']), {'a': ('C', ['s'])})
+
+    def test_many_entries_into_one_chain(self):
+        # every link of a long chain is entered from its own row state; each state should only be read a few times, not
+        # once for every entry upstream of it
+        n = 2000
+        states = [CountingState(f'E{i}', Transition(f'E{i + 1}', [char('x')] if i == n - 1 else [])) for i in range(n)]
+        states += [CountingState(f'R{i}', {char('a'): Transition(f'E{i}')}) for i in range(n)]
+        states.append(CountingState(f'E{n}', {char('a'): Transition('R0')}))
+        dfa = DFA('R0', states, minimise = False)
+        CountingState.reads = 0
+        dfa.minimise_epsilons()
+        self.assertLess(CountingState.reads, 20 * len(states))
+        self.assertEqual(len(dfa.states), n + 1)
+        for i in range(n):
+            self.assertEqual(targets(dfa.states[f'R{i}']), {'a': (f'E{n}', ['x'])})
+
+class TestMinimise(unittest.TestCase):
+    def test_merges_indistinguishable_states(self):
+        dfa = DFA('A1',
+                  [State('A1', {char('b'): Transition('B', [char('b')])}),
+                   State('A2', {char('b'): Transition('D', [char('b')])}),
+                   State('B', {char('a'): Transition('C', [char('b')])}),
+                   State('C', {char('a'): Transition('X', [char('b')])}),
+                   State('D', {char('a'): Transition('D', [char('b')])}),
+                   State('X', {char('a'): Transition('C', [char('b')])})])
+        self.assertEqual(set(dfa.states), {'A1', 'X'})
+        self.assertEqual(dfa.states['X'].transitions.inputs[char('a')].state_to, 'X')
+
+    def test_keeps_start_state_name(self):
+        dfa = DFA('B', [State('A', {char('a'): Transition('A', [char('x')])}),
+                        State('B', {char('a'): Transition('A', [char('x')])})])
+        self.assertEqual(set(dfa.states), {'B'})
+        self.assertEqual(dfa.states['B'].transitions.inputs[char('a')].state_to, 'B')
+
+    def test_halting_state_is_distinct_from_empty_row(self):
+        # H halts immediately, E reads one more symbol before halting
+        dfa = DFA('A', [State('A', {char('a'): Transition('H'), char('b'): Transition('E')}),
+                        State('H'),
+                        State('E', {})])
+        self.assertEqual(set(dfa.states), {'A', 'H', 'E'})
+        next_state, output, remaining = dfa.step(dfa.states['A'], [char('a'), char('c')])
+        next_state, output, remaining = dfa.step(next_state, remaining)
+        self.assertIsNone(next_state)
+        self.assertEqual(remaining, [char('c')])
+
+    def test_distinguishes_by_output(self):
+        dfa = DFA('A', [State('A', {char('a'): Transition('B', [char('x')]), char('b'): Transition('C', [char('x')])}),
+                        State('B', {char('a'): Transition('B', [char('y')])}),
+                        State('C', {char('a'): Transition('C', [char('z')])})])
+        self.assertEqual(set(dfa.states), {'A', 'B', 'C'})
+
+class TestDecide(unittest.TestCase):
+    def test_halts(self):
+        dfa = DFA('A', [State('A', {char('a'): Transition('H')}), State('H')], minimise = False)
+        self.assertEqual(dfa.decide('A', {char('a')}), 'will halt eventually regardless of input')
+
+    def test_runs_forever(self):
+        dfa = DFA('A', [State('A', {char('a'): Transition('B')}), State('B', Transition('A'))], minimise = False)
+        self.assertEqual(dfa.decide('A', {char('a')}), 'will run forever regardless of input')
+
+    def test_may_halt(self):
+        # there is no transition on b, so reading it halts
+        dfa = DFA('A', [State('A', {char('a'): Transition('A')})], minimise = False)
+        self.assertEqual(dfa.decide('A', {char('a'), char('b')}), 'may run forever or halt depending on input')
+
+    def test_shared_successor(self):
+        # D is reached through both B and C; arriving at it again after it has been explored is not a loop
+        def build(d):
+            return DFA('A', [State('A', {char('a'): Transition('B'), char('b'): Transition('C')}),
+                             State('B', {char('a'): Transition('D'), char('b'): Transition('D')}),
+                             State('C', {char('a'): Transition('D'), char('b'): Transition('D')}),
+                             d], minimise = False)
+        inputs = {char('a'), char('b')}
+        self.assertEqual(build(State('D')).decide('A', inputs), 'will halt eventually regardless of input')
+        looping = build(State('D', {char('a'): Transition('D'), char('b'): Transition('D')}))
+        self.assertEqual(looping.decide('A', inputs), 'will run forever regardless of input')
+
+if __name__ == '__main__':
+    unittest.main()